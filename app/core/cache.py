@@ -0,0 +1,82 @@
+import hashlib
+import logging
+
+import orjson
+from typing import Any, Callable, Optional
+
+import redis
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+_redis_client: Optional[redis.Redis] = None
+
+
+def get_redis_client() -> redis.Redis:
+    """Return a shared Redis client (connection pool is thread-safe)"""
+    global _redis_client
+    if _redis_client is None:
+        # Short socket timeouts: a hung Redis must surface as a cache error
+        # (and therefore a miss), never block processing indefinitely
+        _redis_client = redis.Redis.from_url(
+            settings.redis_url,
+            socket_connect_timeout=settings.cache_socket_timeout,
+            socket_timeout=settings.cache_socket_timeout,
+        )
+    return _redis_client
+
+
+def make_key(namespace: str, *parts: Any) -> str:
+    """
+    Build a content-addressed cache key from arbitrary parts.
+
+    Args:
+        namespace: Key prefix identifying the cached value kind
+        parts: Bytes or stringifiable values that determine the content
+
+    Returns:
+        Cache key of the form "namespace:<sha256 hex digest>"
+    """
+    hasher = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, bytes):
+            hasher.update(part)
+        else:
+            hasher.update(str(part).encode('utf-8'))
+        hasher.update(b'\x00')
+    return f"{namespace}:{hasher.hexdigest()}"
+
+
+def get_json(key: str) -> Any:
+    """Get a cached JSON value, returning None on miss or any cache error"""
+    if not settings.cache_enabled:
+        return None
+    try:
+        value = get_redis_client().get(key)
+        if value is None:
+            return None
+        return orjson.loads(value)
+    except Exception as e:
+        logger.warning(f"Cache read failed for {key}: {str(e)}")
+        return None
+
+
+def set_json(key: str, value: Any, ttl: int = None) -> None:
+    """Store a JSON-serializable value; cache errors are logged, not raised"""
+    if not settings.cache_enabled:
+        return
+    try:
+        get_redis_client().setex(key, ttl or settings.cache_ttl, orjson.dumps(value))
+    except Exception as e:
+        logger.warning(f"Cache write failed for {key}: {str(e)}")
+
+
+def get_or_compute(key: str, fn: Callable[[], Any], ttl: int = None) -> Any:
+    """Return the cached value for key, computing and storing it on a miss"""
+    cached = get_json(key)
+    if cached is not None:
+        return cached
+    value = fn()
+    set_json(key, value, ttl)
+    return value
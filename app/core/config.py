@@ -19,6 +19,31 @@ class Settings(BaseSettings):
     ftp_csv_path: str = "/Marketplace/scan_ai/csvs/TimeBuilding2050"
 
     openai_api_key: str
+    # Maximum number of concurrent OpenAI requests per document
+    openai_concurrency: int = 8
+    # Per-request OpenAI timeout in seconds; retries are handled by tenacity
+    openai_timeout: int = 60
+    # Consecutive failures before remaining pages are skipped
+    openai_failure_threshold: int = 5
+    # Request structured JSON output instead of parsing markdown-fenced JSON
+    openai_structured_output: bool = True
+    # Documents with at most this many pages are sent as one multimodal request
+    single_call_page_threshold: int = 8
+    # Skip pages with no text layer and near-uniform pixels in IMAGE_OCR mode
+    skip_blank_pages: bool = True
+    # Use the PDF text layer instead of vision when most pages have one
+    auto_text_extraction: bool = True
+    # Page rendering settings for IMAGE_OCR mode
+    image_format: str = "jpeg"
+    image_target_dpi: int = 150
+    # Lower DPI used for born-digital pages, which stay crisp when rendered
+    image_text_dpi: int = 110
+    image_jpeg_quality: int = 85
+    # Content-addressed caching of rendered pages and LLM responses
+    cache_enabled: bool = True
+    cache_ttl: int = 604800  # 7 days
+    # Socket timeouts so a hung Redis degrades to a cache miss, not a stall
+    cache_socket_timeout: float = 2.0
 
     celery_broker_url: Optional[str] = None
     celery_result_backend: Optional[str] = None
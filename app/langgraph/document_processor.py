@@ -1,19 +1,82 @@
+import asyncio
 import json
-import base64
+import orjson
 import fitz  # PyMuPDF
+import numpy as np
 import io
 import logging
 import os
+import re
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import Dict, Any, TypedDict, List
 from langgraph.graph import StateGraph, END
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage, SystemMessage
+from openai import APIConnectionError, APITimeoutError, RateLimitError
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_exponential_jitter
+try:
+    import pybase64 as base64  # SIMD-accelerated drop-in for stdlib base64
+except ImportError:
+    import base64
+
+try:
+    import fastjsonschema
+except ImportError:
+    fastjsonschema = None
+
+from app.core import cache
 from app.core.config import settings
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
+# Compiled once at import; these run per response / per act item in hot loops
+# Strips markdown code fence markers so raw_decode sees bare JSON
+_FENCE_RE = re.compile(r'^```(?:json)?\s*|\s*```$', re.MULTILINE)
+_JSON_DECODER = json.JSONDecoder()
+# Site and order references share one alternation so each description is
+# scanned once; named groups tell the matches apart. Zero-width lookahead
+# branches keep a site capture from consuming the text an order reference
+# sits in, so matches can overlap like the separate scans reported them
+_SITE_ORDER_RE = re.compile(
+    r'(?=объект[:\s]+(?P<site>[^,\n]+))|(?=заказ[^\w]*(?P<order>\d+))',
+    re.IGNORECASE
+)
+# Accepts plain numerics with either decimal separator (Russian comma)
+_NUM_RE = re.compile(r'^-?\d+(?:[.,]\d+)?$')
+# Strips currency symbols, separators and (non-breaking) spaces from
+# monetary strings; quantities map the Russian decimal comma to a dot
+_CURRENCY_TBL = str.maketrans('', '', '₽, \xa0')
+_QUANTITY_TBL = str.maketrans({",": ".", " ": "", "\xa0": ""})
+# Document-level metadata copied from the most complete page
+_META_KEYS = frozenset(("document_type", "document_number", "date_of_issue", "customer", "contractor", "contract"))
+
+class _CircuitBreaker:
+    """
+    Counts consecutive LLM failures for one document.
+
+    Once the threshold is reached the remaining pages are skipped instead of
+    each paying its own timeout against a provider that is already failing.
+    """
+
+    def __init__(self, threshold: int):
+        self.threshold = threshold
+        self.consecutive_failures = 0
+
+    @property
+    def open(self) -> bool:
+        return self.consecutive_failures >= self.threshold
+
+    def record_success(self) -> None:
+        self.consecutive_failures = 0
+
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+
+
 class DocumentState(TypedDict):
     file_content: bytes
     file_type_prompts: Dict[str, Any]
@@ -26,45 +89,154 @@ class DocumentState(TypedDict):
     verification_enabled: bool
     extracted_text: str
 
-def pdf_to_images(pdf_content: bytes, max_pages: int = None) -> List[str]:
+def pdf_to_images(pdf_content: bytes, max_pages: int = None, image_format: str = None) -> List[str]:
     """
-    Convert PDF pages to base64 encoded PNG images.
-    
+    Convert PDF pages to base64 encoded images.
+
     Args:
         pdf_content: PDF file content as bytes
-        max_pages: Maximum number of pages to convert (default: 1)
-    
+        max_pages: Maximum number of pages to convert (default: all pages)
+        image_format: "jpeg" or "png" (default: settings.image_format)
+
     Returns:
-        List of base64 encoded PNG images
+        List of base64 encoded images
     """
+    if image_format is None:
+        image_format = settings.image_format
+
     try:
-        # Open PDF from bytes
+        # Open PDF from bytes just to count pages; workers open their own handles
         pdf_document = fitz.open(stream=pdf_content, filetype="pdf")
-        images = []
-        
-        # Convert pages to images
-        pages_to_process = pdf_document.page_count if max_pages is None else min(max_pages, pdf_document.page_count)
-        for page_num in range(pages_to_process):
-            page = pdf_document.load_page(page_num)
-            
-            # Render page as PNG with high resolution
-            mat = fitz.Matrix(2.0, 2.0)  # 2x zoom for better quality
-            pix = page.get_pixmap(matrix=mat)
-            
-            # Convert to PNG bytes
-            png_data = pix.tobytes("png")
-            
-            # Encode as base64
-            png_base64 = base64.b64encode(png_data).decode('utf-8')
-            images.append(png_base64)
-        
+        page_count = pdf_document.page_count
         pdf_document.close()
+
+        pages_to_process = page_count if max_pages is None else min(max_pages, page_count)
+        if pages_to_process == 0:
+            return []
+
+        # Render at the target DPI (PDF native resolution is 72 DPI)
+        zoom = settings.image_target_dpi / 72.0
+
+        # Pool spin-up costs more than it saves on one- or two-page documents
+        if pages_to_process <= 2:
+            return [_render_page(pdf_content, page_num, zoom, image_format)
+                    for page_num in range(pages_to_process)]
+
+        # MuPDF releases the GIL while rendering, so pages render in parallel
+        with ThreadPoolExecutor(max_workers=min(pages_to_process, os.cpu_count() or 1)) as executor:
+            images = list(executor.map(
+                lambda page_num: _render_page(pdf_content, page_num, zoom, image_format),
+                range(pages_to_process)
+            ))
+
         return images
-        
+
     except Exception as e:
         raise Exception(f"Failed to convert PDF to images: {str(e)}")
 
 
+_render_local = threading.local()
+
+
+def _open_render_document(pdf_content: bytes) -> "fitz.Document":
+    """
+    Return a per-thread document handle for pdf_content.
+
+    All render threads share the same pdf_content buffer (no copies are made
+    for the workers), but MuPDF document handles must stay on one thread, so
+    each worker caches its own parsed document and reuses it across the pages
+    it renders instead of re-parsing the PDF per page. The handle keeps the
+    stream alive, so the identity key cannot alias a freed buffer.
+    """
+    doc_key = (id(pdf_content), len(pdf_content))
+    if getattr(_render_local, "doc_key", None) != doc_key:
+        if getattr(_render_local, "doc", None) is not None:
+            _render_local.doc.close()
+        _render_local.doc = fitz.open(stream=pdf_content, filetype="pdf")
+        _render_local.doc_key = doc_key
+    return _render_local.doc
+
+
+def _render_page(pdf_content: bytes, page_num: int, zoom: float, image_format: str) -> str:
+    """
+    Render a single PDF page to a base64 encoded image.
+
+    Uses a per-thread document handle because MuPDF documents are not
+    thread-safe.
+
+    Args:
+        pdf_content: PDF file content as bytes
+        page_num: Zero-based page number to render
+        zoom: Zoom factor derived from the target DPI
+        image_format: "jpeg" or "png"
+
+    Returns:
+        Base64 encoded image for the page
+    """
+    cache_key = cache.make_key("page_image", pdf_content, page_num, zoom, image_format)
+    cached = cache.get_json(cache_key)
+    if cached is not None:
+        return cached
+
+    pdf_document = _open_render_document(pdf_content)
+    page = pdf_document.load_page(page_num)
+    # Born-digital pages render crisply at a lower DPI, roughly halving the
+    # pixel count; scans keep the full target DPI so small print survives
+    if settings.image_text_dpi and len(page.get_text().strip()) > 200:
+        zoom = min(zoom, settings.image_text_dpi / 72.0)
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom))
+
+    # JPEG is far smaller than PNG for scans; GPT-4o downsamples internally
+    # anyway, so the lossless encoding buys nothing on the default path
+    if image_format == "png":
+        img_data = pix.tobytes("png")
+    else:
+        img_data = pix.tobytes("jpeg", jpg_quality=settings.image_jpeg_quality)
+
+    img_base64 = base64.b64encode(img_data).decode('utf-8')
+    cache.set_json(cache_key, img_base64)
+    return img_base64
+
+
+def _scan_pdf_pages(pdf_content: bytes) -> tuple:
+    """
+    Count pages and flag likely-blank ones.
+
+    Blocking MuPDF work; callers on the event loop run this in a thread.
+
+    Returns:
+        (page_count, blank_pages) where blank_pages holds one-based numbers
+    """
+    pdf_document = fitz.open(stream=pdf_content, filetype="pdf")
+    try:
+        page_count = pdf_document.page_count
+        blank_pages = set()
+        if settings.skip_blank_pages:
+            blank_pages = {
+                page_num + 1 for page_num in range(page_count)
+                if _is_blank_page(pdf_document.load_page(page_num))
+            }
+        return page_count, blank_pages
+    finally:
+        pdf_document.close()
+
+
+def _is_blank_page(page) -> bool:
+    """
+    Cheap check for pages not worth an LLM call.
+
+    Born-digital blanks are caught by the (free) text layer; scanned blanks
+    have no text layer at all, so fall back to the pixel spread of a low-res
+    pixmap, which is near zero for an empty sheet.
+    """
+    if len(page.get_text("text").strip()) >= 5:
+        return False
+
+    pix = page.get_pixmap(matrix=fitz.Matrix(0.25, 0.25))
+    samples = np.frombuffer(pix.samples, dtype=np.uint8)
+    return samples.size == 0 or float(samples.std()) < 2.0
+
+
 def pdf_to_text_by_page(pdf_content: bytes) -> List[str]:
     """
     Extract text from PDF pages individually.
@@ -83,10 +255,18 @@ def pdf_to_text_by_page(pdf_content: bytes) -> List[str]:
         # Extract text from each page separately
         for page_num in range(pdf_document.page_count):
             page = pdf_document.load_page(page_num)
-            page_text = page.get_text()
-            
+            # Block extraction keeps table rows together and drops the
+            # whitespace padding the default "text" mode emits; sorting by
+            # (row band, x) restores reading order for multi-column layouts
+            blocks = [
+                block for block in page.get_text("blocks")
+                if block[6] == 0 and block[4].strip()
+            ]
+            blocks.sort(key=lambda block: (round(block[1] / 10), block[0]))
+            page_text = "\n".join(block[4].strip() for block in blocks)
+
             # Add page text (even if empty, to maintain page indexing)
-            page_texts.append(page_text if page_text.strip() else "")
+            page_texts.append(page_text)
         
         pdf_document.close()
         return page_texts
@@ -121,131 +301,110 @@ def parse_chatgpt_response(content: str) -> Dict[str, Any]:
     """Parse ChatGPT response and extract JSON data"""
     try:
         # First, try to parse the response directly as JSON
-        return json.loads(content)
-    except json.JSONDecodeError:
-        # If direct parsing fails, try to extract JSON from markdown code blocks
-        try:
-            content = content.strip()
-
-            # Look for JSON code blocks
-            if "```json" in content:
-                # Extract content between ```json and ```
-                start = content.find("```json") + 7
-                end = content.find("```", start)
-                if end != -1:
-                    json_content = content[start:end].strip()
-                    return json.loads(json_content)
-                else:
-                    raise json.JSONDecodeError("Could not find closing ```", content, 0)
-            elif "```" in content:
-                # Try generic code blocks
-                start = content.find("```") + 3
-                end = content.find("```", start)
-                if end != -1:
-                    json_content = content[start:end].strip()
-                    return json.loads(json_content)
-                else:
-                    raise json.JSONDecodeError("Could not find closing ```", content, 0)
-            else:
-                # Try to find JSON-like content in the response
-                import re
-                json_match = re.search(r'(\{.*\})', content, re.DOTALL)
-                if json_match:
-                    json_content = json_match.group(1)
-                    return json.loads(json_content)
-                else:
-                    raise json.JSONDecodeError("No JSON found in response", content, 0)
+        return orjson.loads(content)
+    except orjson.JSONDecodeError:
+        # If direct parsing fails, strip code fences and decode from the
+        # first brace; raw_decode stops at the end of the object, so
+        # surrounding prose is skipped in one linear scan
+        stripped = _FENCE_RE.sub("", content.strip())
+        start = stripped.find('{')
+        if start != -1:
+            try:
+                parsed, _ = _JSON_DECODER.raw_decode(stripped, start)
+                return parsed
+            except json.JSONDecodeError:
+                pass
 
-        except (json.JSONDecodeError, IndexError, AttributeError):
-            # If all parsing attempts fail, store raw response with error
-            return {
-                "raw_response": content,
-                "parsing_error": "Failed to extract valid JSON from ChatGPT response"
-            }
+        # If all parsing attempts fail, store raw response with error
+        return {
+            "raw_response": content,
+            "parsing_error": "Failed to extract valid JSON from ChatGPT response"
+        }
+
+def _quantity_value(item: Dict[str, Any]) -> float:
+    """Parse an act item quantity, returning NaN when missing or invalid"""
+    try:
+        return float(str(item["quantity"]).translate(_QUANTITY_TBL))
+    except (KeyError, ValueError, TypeError):
+        return np.nan
+
+def _cost_value(item: Dict[str, Any]) -> float:
+    """Parse an act item total cost, returning NaN when missing or invalid"""
+    try:
+        cost_str = str(item["total_cost"]).translate(_CURRENCY_TBL).replace("руб", "").strip()
+        return float(cost_str) if cost_str else 0.0
+    except (KeyError, ValueError, TypeError):
+        return np.nan
 
 def aggregate_page_results(page_results: List[Dict[str, Any]]) -> Dict[str, Any]:
     """Aggregate results from multiple pages into a single consolidated result"""
-    successful_pages = [page for page in page_results if page.get("page_processing_status") == "success"]
-    
-    if not successful_pages:
-        return {
-            "error": "No pages were successfully processed",
-            "page_results": page_results,
-            "pages_processed": 0
-        }
-    
-    # Initialize aggregated structure
-    aggregated = {
-        "pages_processed": len(successful_pages),
-        "total_pages": len(page_results),
-        "page_results": page_results,
-        "aggregated_data": {}
-    }
-    
-    # Find the most complete document metadata (usually from first page)
-    base_data = None
-    for page in successful_pages:
-        if not page.get("parsing_error") and "document_type" in page:
-            base_data = page
-            break
-    
-    if not base_data and successful_pages:
-        base_data = successful_pages[0]
-    
-    if base_data:
-        # Copy basic document information
-        for key in ["document_type", "document_number", "date_of_issue", "customer", "contractor", "contract"]:
-            if key in base_data:
-                aggregated["aggregated_data"][key] = base_data[key]
-    
-    # Aggregate act items from all pages
+    # Single pass over the pages: count successes, pick the base metadata
+    # page and collect act items with their site/order extractions
     all_act_items = []
     sites = set()
     order_numbers = set()
-    
-    for page in successful_pages:
+    base_data = None
+    first_success = None
+    successful_count = 0
+
+    for page in page_results:
+        if page.get("page_processing_status") != "success":
+            continue
+        successful_count += 1
+
+        if first_success is None:
+            first_success = page
+
+        # The most complete document metadata (usually from first page)
+        if base_data is None and not page.get("parsing_error") and "document_type" in page:
+            base_data = page
+
         if "act" in page and isinstance(page["act"], dict):
             # Collect act items
             if "items" in page["act"] and isinstance(page["act"]["items"], list):
                 for item in page["act"]["items"]:
                     if isinstance(item, dict):
-                        # Add page reference to item
-                        item_with_page = item.copy()
-                        item_with_page["source_page"] = page.get("page_number", 0)
-                        all_act_items.append(item_with_page)
-                        
+                        # Tag the page reference in place; the items were
+                        # deserialized for this call and have no other owner
+                        item["source_page"] = page.get("page_number", 0)
+                        all_act_items.append(item)
+
                         # Extract sites and order numbers
                         description = item.get("service_description", "")
                         if isinstance(description, str):
                             # Simple extraction - could be enhanced
-                            import re
-                            site_matches = re.findall(r'объект[:\s]+([^,\n]+)', description, re.IGNORECASE)
-                            sites.update(match.strip() for match in site_matches)
-                            
-                            order_matches = re.findall(r'заказ[^\w]*(\d+)', description, re.IGNORECASE)
-                            order_numbers.update(order_matches)
-    
-    # Calculate totals
-    total_quantity = 0
-    total_cost = 0
-    
-    for item in all_act_items:
-        # Sum quantities
-        if "quantity" in item:
-            try:
-                quantity = float(str(item["quantity"]).replace(",", "."))
-                total_quantity += quantity
-            except (ValueError, TypeError):
-                pass
-        
-        # Sum costs
-        if "total_cost" in item:
-            try:
-                cost_str = str(item["total_cost"]).replace("₽", "").replace("руб", "").replace(",", "").strip()
-                cost_value = float(cost_str) if cost_str else 0
-                total_cost += cost_value
-            except (ValueError, TypeError):
-                pass
+                            for match in _SITE_ORDER_RE.finditer(description):
+                                site = match.group("site")
+                                if site is not None:
+                                    sites.add(site.strip())
+                                else:
+                                    order_numbers.add(match.group("order"))
+
+    if successful_count == 0:
+        return {
+            "error": "No pages were successfully processed",
+            "page_results": page_results,
+            "pages_processed": 0
+        }
+
+    if base_data is None:
+        base_data = first_success
+
+    # Initialize aggregated structure with the basic document information
+    aggregated = {
+        "pages_processed": successful_count,
+        "total_pages": len(page_results),
+        "page_results": page_results,
+        "aggregated_data": {key: base_data[key] for key in _META_KEYS & base_data.keys()}
+    }
+
+    # Calculate totals (vectorized sum; acts can carry thousands of line items)
+    quantities = np.fromiter((_quantity_value(item) for item in all_act_items),
+                             dtype=np.float64, count=len(all_act_items))
+    costs = np.fromiter((_cost_value(item) for item in all_act_items),
+                        dtype=np.float64, count=len(all_act_items))
+    total_quantity = float(np.nansum(quantities))
+    total_cost = float(np.nansum(costs))
     
     # Create aggregated act structure
     aggregated["aggregated_data"]["act"] = {
@@ -263,8 +422,8 @@ def aggregate_page_results(page_results: List[Dict[str, Any]]) -> Dict[str, Any]
     
     # Add processing summary
     aggregated["processing_summary"] = {
-        "pages_with_errors": len([p for p in page_results if p.get("page_processing_status") != "success"]),
-        "pages_successfully_processed": len(successful_pages),
+        "pages_with_errors": len(page_results) - successful_count,
+        "pages_successfully_processed": successful_count,
         "total_act_items_found": len(all_act_items),
         "unique_sites_found": len(sites),
         "unique_order_numbers_found": len(order_numbers)
@@ -272,6 +431,30 @@ def aggregate_page_results(page_results: List[Dict[str, Any]]) -> Dict[str, Any]
     
     return aggregated
 
+def _has_text_layer(pdf_content: bytes) -> bool:
+    """
+    Check whether the PDF is born-digital enough to skip the vision path.
+
+    Returns True when at least 90% of pages carry more than 200 characters
+    of extractable text, in which case direct text extraction beats
+    rasterizing and shipping images to GPT-4o vision on both cost and
+    latency.
+    """
+    pdf_document = fitz.open(stream=pdf_content, filetype="pdf")
+    try:
+        page_count = pdf_document.page_count
+        if page_count == 0:
+            return False
+
+        pages_with_text = sum(
+            1 for page_num in range(page_count)
+            if len(pdf_document.load_page(page_num).get_text().strip()) > 200
+        )
+        return pages_with_text / page_count >= 0.9
+    finally:
+        pdf_document.close()
+
+
 def extract_content_node(state: DocumentState) -> DocumentState:
     """Extract content from PDF based on processing mode"""
     if state["error"]:
@@ -284,6 +467,12 @@ def extract_content_node(state: DocumentState) -> DocumentState:
             # Set processing mode for page-by-page text extraction
             state["processing_mode"] = "TEXT_EXTRACTION"
             state["extracted_text"] = ""  # Will be processed page by page
+        elif settings.auto_text_extraction and _has_text_layer(state["file_content"]):
+            # Born-digital PDF: its text layer is cheaper and faster than
+            # rasterizing pages for the vision model
+            logger.info("Text layer detected; switching to TEXT_EXTRACTION mode")
+            state["processing_mode"] = "TEXT_EXTRACTION"
+            state["extracted_text"] = ""
         else:
             # Default to IMAGE_OCR mode
             state["processing_mode"] = "IMAGE_OCR"
@@ -296,168 +485,481 @@ def extract_content_node(state: DocumentState) -> DocumentState:
     
     return state
 
-def process_with_chatgpt_node(state: DocumentState) -> DocumentState:
+_LLM = None
+
+
+def _get_llm() -> ChatOpenAI:
+    """
+    Return the shared ChatOpenAI client, creating it on first use.
+
+    A single client keeps one httpx connection pool alive across documents,
+    so TLS sessions to api.openai.com are reused instead of rebuilt per node
+    invocation.
+    """
+    global _LLM
+    if _LLM is None:
+        _LLM = ChatOpenAI(
+            model="gpt-4o",
+            api_key=settings.openai_api_key,
+            temperature=0,
+            timeout=settings.openai_timeout,
+            max_retries=0  # tenacity owns retries in _ainvoke_with_retry
+        )
+    return _LLM
+
+def _build_response_format(file_type_prompts: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Build an OpenAI json_schema response format from the required fields.
+
+    With structured outputs the model emits plain JSON (never markdown
+    fences), so parse_chatgpt_response succeeds on the first orjson.loads
+    and the regex fallbacks become dead paths.
+    """
+    required_fields = file_type_prompts.get("required_fields", [])
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": "page_extraction",
+            "schema": {
+                "type": "object",
+                "properties": {field: {} for field in required_fields},
+                "required": list(required_fields),
+                "additionalProperties": True
+            }
+        }
+    }
+
+@retry(
+    wait=wait_exponential_jitter(initial=1, max=30),
+    stop=stop_after_attempt(3),
+    retry=retry_if_exception_type((APIConnectionError, APITimeoutError, RateLimitError)),
+    reraise=True
+)
+async def _ainvoke_with_retry(llm, messages: list):
+    """Invoke the LLM, retrying transient OpenAI errors with jittered backoff"""
+    return await llm.ainvoke(messages)
+
+async def _invoke_cached(llm, messages: list) -> str:
+    """
+    Invoke the LLM, caching responses keyed by model and full message content.
+
+    Retries and reruns of the same document hit the cache instead of paying
+    another OpenAI round-trip; image payloads are part of the key, so any
+    change to prompts, rendering or page content misses cleanly.
+    """
+    model_name = getattr(llm, "model_name", "gpt-4o")
+    # Bound kwargs (e.g. response_format) change the output shape, so they
+    # are part of the key alongside model and message content
+    bound_kwargs = getattr(llm, "kwargs", None) or {}
+    cache_key = cache.make_key(
+        "llm_response", model_name,
+        json.dumps(bound_kwargs, ensure_ascii=False, sort_keys=True, default=str),
+        json.dumps([message.content for message in messages], ensure_ascii=False)
+    )
+
+    # The cache client is synchronous; keep its network calls off the loop
+    cached = await asyncio.to_thread(cache.get_json, cache_key)
+    if cached is not None:
+        return cached["content"]
+
+    response = await _ainvoke_with_retry(llm, messages)
+
+    token_usage = (getattr(response, "response_metadata", None) or {}).get("token_usage") or {}
+    cached_tokens = (token_usage.get("prompt_tokens_details") or {}).get("cached_tokens")
+    if cached_tokens:
+        logger.debug(f"OpenAI prompt cache hit: {cached_tokens} cached prompt tokens")
+
+    await asyncio.to_thread(cache.set_json, cache_key, {"content": response.content})
+    return response.content
+
+async def _process_pages_concurrently(llm, page_messages: List[tuple], total_pages: int) -> List[Dict[str, Any]]:
+    """
+    Invoke ChatGPT for multiple pages concurrently, bounded by a semaphore.
+
+    Args:
+        llm: ChatOpenAI client to use for the calls
+        page_messages: List of (page_number, messages) tuples to process
+        total_pages: Total number of pages in the document (for logging)
+
+    Returns:
+        List of page result dicts, one per input tuple, in input order
+    """
+    semaphore = asyncio.Semaphore(settings.openai_concurrency)
+    breaker = _CircuitBreaker(settings.openai_failure_threshold)
+
+    async def process_page(page_number: int, messages: list) -> Dict[str, Any]:
+        async with semaphore:
+            if breaker.open:
+                logger.warning(f"Page {page_number}: Skipped (circuit open after repeated OpenAI failures)")
+                return {
+                    "page_number": page_number,
+                    "page_processing_status": "skipped_circuit_open",
+                    "note": "Skipped after repeated OpenAI failures"
+                }
+
+            logger.info(f"Processing page {page_number}/{total_pages}")
+            try:
+                content = await _invoke_cached(llm, messages)
+            except Exception:
+                breaker.record_failure()
+                raise
+            breaker.record_success()
+            page_result = parse_chatgpt_response(content)
+
+            # Add page metadata
+            page_result["page_number"] = page_number
+            page_result["page_processing_status"] = "success"
+            return page_result
+
+    responses = await asyncio.gather(
+        *[process_page(page_number, messages) for page_number, messages in page_messages],
+        return_exceptions=True
+    )
+
+    page_results = []
+    for (page_number, _), response in zip(page_messages, responses):
+        if isinstance(response, Exception):
+            # Log page processing error but continue with other pages
+            logger.error(f"Page {page_number}: Failed - {str(response)}")
+            page_results.append({
+                "page_number": page_number,
+                "page_processing_status": "failed",
+                "error": str(response)
+            })
+        else:
+            logger.info(f"Page {page_number}: Successfully processed")
+            page_results.append(response)
+
+    return page_results
+
+async def _process_pages_single_call(llm, system_prompt: str, pdf_images: List[str], image_mime: str = "image/jpeg") -> List[Dict[str, Any]]:
+    """
+    Process all page images in a single multimodal ChatGPT request.
+
+    Sends every page as an image part of one HumanMessage and asks the model
+    to return per-page results keyed by page number, saving one network
+    round-trip and one system-prompt prefill per page.
+
+    Args:
+        llm: ChatOpenAI client to use for the call
+        system_prompt: System prompt shared by all pages (includes the
+            extraction instructions)
+        pdf_images: Base64 encoded page images
+
+    Returns:
+        List of page result dicts, one per page, in page order
+    """
+    batch_prompt = (
+        f"This document has {len(pdf_images)} pages, attached in order. "
+        f"Extract information from each page separately and return JSON of the form "
+        f'{{"pages": [{{"page_number": 1, ...}}, ...]}} with one entry per page.'
+    )
+    message_content = [{"type": "text", "text": batch_prompt}]
+    for image_base64 in pdf_images:
+        message_content.append({
+            "type": "image_url",
+            "image_url": {
+                "url": f"data:{image_mime};base64,{image_base64}"
+            }
+        })
+
+    messages = [
+        SystemMessage(content=system_prompt),
+        HumanMessage(content=message_content)
+    ]
+
+    content = await _invoke_cached(llm, messages)
+    batch_result = parse_chatgpt_response(content)
+
+    if "parsing_error" in batch_result or not isinstance(batch_result.get("pages"), list):
+        raise Exception("Batched response did not contain per-page results")
+
+    # Route each element into a page result, preserving page order
+    results_by_page = {}
+    for entry in batch_result["pages"]:
+        if isinstance(entry, dict) and isinstance(entry.get("page_number"), int):
+            entry["page_processing_status"] = "success"
+            results_by_page[entry["page_number"]] = entry
+
+    page_results = []
+    for page_number in range(1, len(pdf_images) + 1):
+        if page_number in results_by_page:
+            page_results.append(results_by_page[page_number])
+        else:
+            page_results.append({
+                "page_number": page_number,
+                "page_processing_status": "failed",
+                "error": "Page missing from batched response"
+            })
+
+    return page_results
+
+async def _process_pages_overlapped(llm, system_prompt: str, pdf_content: bytes,
+                                    page_count: int, image_format: str, image_mime: str,
+                                    blank_pages: set = None) -> List[Dict[str, Any]]:
+    """
+    Render pages and call ChatGPT concurrently via a producer/consumer queue.
+
+    The producer rasterizes pages in a thread pool and hands each one to the
+    LLM consumers as soon as it is ready, so rendering CPU overlaps with
+    OpenAI network I/O instead of completing up front. The bounded queue
+    keeps only a handful of rendered pages in memory at a time.
+
+    Args:
+        llm: ChatOpenAI client to use for the calls
+        system_prompt: System prompt shared by all pages (includes the
+            extraction instructions)
+        pdf_content: PDF file content as bytes
+        page_count: Number of pages to process
+        image_format: "jpeg" or "png"
+        image_mime: MIME type matching image_format
+        blank_pages: One-based page numbers to skip as blank
+
+    Returns:
+        List of page result dicts, one per page, in page order
+    """
+    blank_pages = blank_pages or set()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=settings.openai_concurrency)
+    num_consumers = min(settings.openai_concurrency, page_count)
+    loop = asyncio.get_running_loop()
+    zoom = settings.image_target_dpi / 72.0
+    results: Dict[int, Dict[str, Any]] = {}
+    breaker = _CircuitBreaker(settings.openai_failure_threshold)
+
+    async def produce():
+        # Keep a bounded window of render futures in flight so rendering runs
+        # in parallel without materializing every page at once
+        pending = deque()
+        next_page = 0
+        with ThreadPoolExecutor(max_workers=min(page_count, os.cpu_count() or 1)) as executor:
+            while next_page < page_count or pending:
+                while next_page < page_count and len(pending) < settings.openai_concurrency:
+                    if next_page + 1 in blank_pages:
+                        logger.info(f"Page {next_page + 1}: Skipped (blank page)")
+                        results[next_page + 1] = {
+                            "page_number": next_page + 1,
+                            "page_processing_status": "skipped_blank",
+                            "note": "Page appears to be blank"
+                        }
+                        next_page += 1
+                        continue
+                    pending.append((next_page + 1, loop.run_in_executor(
+                        executor, _render_page, pdf_content, next_page, zoom, image_format)))
+                    next_page += 1
+
+                page_number, future = pending.popleft()
+                try:
+                    image_base64 = await future
+                except Exception as e:
+                    logger.error(f"Page {page_number}: Rendering failed - {str(e)}")
+                    results[page_number] = {
+                        "page_number": page_number,
+                        "page_processing_status": "failed",
+                        "error": f"Rendering failed: {str(e)}"
+                    }
+                    continue
+                await queue.put((page_number, image_base64))
+
+        # One sentinel per consumer to close the queue
+        for _ in range(num_consumers):
+            await queue.put(None)
+
+    async def consume():
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            page_number, image_base64 = item
+
+            if breaker.open:
+                logger.warning(f"Page {page_number}: Skipped (circuit open after repeated OpenAI failures)")
+                results[page_number] = {
+                    "page_number": page_number,
+                    "page_processing_status": "skipped_circuit_open",
+                    "note": "Skipped after repeated OpenAI failures"
+                }
+                continue
+
+            logger.info(f"Processing page {page_number}/{page_count}")
+
+            # TODO: Remove debug saving before commit - save base64 image info for debugging
+            image_info = f"Base64 image data (length: {len(image_base64)} characters)"
+            save_debug_text(image_info, page_number, "IMAGE_OCR")
+
+            page_prompt = f"Page {page_number} of {page_count}. Extract information from this specific page."
+            messages = [
+                SystemMessage(content=system_prompt),
+                HumanMessage(content=[
+                    {"type": "text", "text": page_prompt},
+                    {
+                        "type": "image_url",
+                        "image_url": {
+                            "url": f"data:{image_mime};base64,{image_base64}"
+                        }
+                    }
+                ])
+            ]
+
+            try:
+                content = await _invoke_cached(llm, messages)
+                breaker.record_success()
+                page_result = parse_chatgpt_response(content)
+                page_result["page_number"] = page_number
+                page_result["page_processing_status"] = "success"
+                logger.info(f"Page {page_number}: Successfully processed")
+            except Exception as e:
+                # Log page processing error but continue with other pages
+                breaker.record_failure()
+                logger.error(f"Page {page_number}: Failed - {str(e)}")
+                page_result = {
+                    "page_number": page_number,
+                    "page_processing_status": "failed",
+                    "error": str(e)
+                }
+            results[page_number] = page_result
+
+    await asyncio.gather(produce(), *[consume() for _ in range(num_consumers)])
+
+    return [results[page_number] for page_number in sorted(results)]
+
+async def process_with_chatgpt_node(state: DocumentState) -> DocumentState:
     """Process document content with ChatGPT based on processing mode"""
     if state["error"]:
         return state
 
     try:
-        llm = ChatOpenAI(
-            model="gpt-4o",
-            api_key=settings.openai_api_key,
-            temperature=0
-        )
+        llm = _get_llm()
 
         system_prompt = state["file_type_prompts"].get("system_prompt", "")
         extraction_prompt = state["file_type_prompts"].get("extraction_prompt", "")
         processing_mode = state.get("processing_mode", "IMAGE_OCR")
 
+        if settings.openai_structured_output:
+            # Per-page calls constrain the schema to the required fields; the
+            # batched call returns a different {"pages": [...]} shape, so it
+            # only pins the output to JSON
+            page_llm = llm.bind(response_format=_build_response_format(state["file_type_prompts"]))
+            batch_llm = llm.bind(response_format={"type": "json_object"})
+        else:
+            page_llm = batch_llm = llm
+
+        # Keep the system message byte-identical across pages (page specifics
+        # go in the HumanMessage) so OpenAI prompt caching can reuse the
+        # prefill after the first page; folding the extraction prompt in makes
+        # the stable prefix as long as possible
+        system_prompt = f"{system_prompt}\n\n{extraction_prompt}".strip()
+
         if processing_mode == "TEXT_EXTRACTION":
             # Page-by-page text-based processing
             try:
-                page_texts = pdf_to_text_by_page(state["file_content"])
-                
+                page_texts = await asyncio.to_thread(pdf_to_text_by_page, state["file_content"])
+
                 if not page_texts:
                     raise Exception("No text extracted from PDF")
 
                 state["total_pages"] = len(page_texts)
                 state["page_results"] = []
-                
+
                 logger.info(f"Processing document with {len(page_texts)} pages in TEXT_EXTRACTION mode")
 
-                # Process each page separately
+                # Build per-page messages, recording empty pages as skipped
+                skipped_results = {}
+                page_messages = []
                 for page_idx, page_text in enumerate(page_texts):
-                    state["current_page"] = page_idx + 1
-                    
-                    logger.info(f"Processing page {page_idx + 1}/{len(page_texts)}")
-                    
-                    try:
-                        if not page_text.strip():
-                            # Skip empty pages but record them
-                            logger.info(f"Page {page_idx + 1}: Skipped (empty text)")
-                            empty_result = {
-                                "page_number": page_idx + 1,
-                                "page_processing_status": "skipped",
-                                "note": "Page contains no text"
-                            }
-                            state["page_results"].append(empty_result)
-                            continue
-                        
-                        # TODO: Remove debug saving before commit
-                        save_debug_text(page_text, page_idx + 1, "TEXT_EXTRACTION")
-                        
-                        # Create message for this page's text
-                        page_prompt = f"{extraction_prompt}\n\nPage {page_idx + 1} of {len(page_texts)}. Extract information from this specific page."
-                        messages = [
-                            SystemMessage(content=system_prompt),
-                            HumanMessage(content=f"{page_prompt}\n\nPage text:\n{page_text}")
-                        ]
-
-                        response = llm.invoke(messages)
-                        page_result = parse_chatgpt_response(response.content)
-                        
-                        # Add page metadata
-                        page_result["page_number"] = page_idx + 1
-                        page_result["page_processing_status"] = "success"
-                        
-                        state["page_results"].append(page_result)
-                        logger.info(f"Page {page_idx + 1}: Successfully processed")
-                        
-                    except Exception as e:
-                        # Log page processing error but continue with other pages
-                        logger.error(f"Page {page_idx + 1}: Failed - {str(e)}")
-                        error_result = {
+                    if not page_text.strip():
+                        # Skip empty pages but record them
+                        logger.info(f"Page {page_idx + 1}: Skipped (empty text)")
+                        skipped_results[page_idx + 1] = {
                             "page_number": page_idx + 1,
-                            "page_processing_status": "failed",
-                            "error": str(e)
+                            "page_processing_status": "skipped",
+                            "note": "Page contains no text"
                         }
-                        state["page_results"].append(error_result)
+                        continue
+
+                    # TODO: Remove debug saving before commit
+                    save_debug_text(page_text, page_idx + 1, "TEXT_EXTRACTION")
+
+                    # Create message for this page's text
+                    page_prompt = f"Page {page_idx + 1} of {len(page_texts)}. Extract information from this specific page."
+                    page_messages.append((page_idx + 1, [
+                        SystemMessage(content=system_prompt),
+                        HumanMessage(content=f"{page_prompt}\n\nPage text:\n{page_text}")
+                    ]))
+
+                # Process all non-empty pages concurrently
+                processed_results = await _process_pages_concurrently(page_llm, page_messages, len(page_texts))
+                results_by_page = {result["page_number"]: result for result in processed_results}
+                results_by_page.update(skipped_results)
+                state["page_results"] = [results_by_page[n] for n in sorted(results_by_page)]
+                state["current_page"] = len(page_texts)
 
                 # Aggregate results from all pages
                 successful_pages = len([p for p in state["page_results"] if p.get("page_processing_status") == "success"])
                 logger.info(f"Completed processing. Successful pages: {successful_pages}/{len(page_texts)}")
-                
+
                 if state["page_results"]:
                     state["processing_result"] = aggregate_page_results(state["page_results"])
                     state["processing_result"]["processing_mode"] = "TEXT_EXTRACTION"
                 else:
                     state["error"] = "No pages were successfully processed"
-                
+
             except Exception as e:
                 logger.error(f"Text-based processing failed: {str(e)}")
                 state["error"] = f"Text-based processing failed: {str(e)}"
-                
+
         else:
             # Image-based processing (original method)
             try:
-                pdf_images = pdf_to_images(state["file_content"], max_pages=None)
-                
-                if not pdf_images:
+                # Verification needs lossless pages; otherwise the file type
+                # may override the global format (e.g. PNG for line art)
+                if state.get("verification_enabled"):
+                    image_format = "png"
+                else:
+                    image_format = state["file_type_prompts"].get("image_format", settings.image_format)
+                image_mime = "image/png" if image_format == "png" else "image/jpeg"
+
+                # Count pages and flag blanks up front; rendering happens per
+                # page below. Run off the event loop so concurrent documents
+                # in the same worker are not blocked.
+                page_count, blank_pages = await asyncio.to_thread(_scan_pdf_pages, state["file_content"])
+
+                if page_count == 0:
                     raise Exception("No images generated from PDF")
             except Exception as e:
                 logger.error(f"PDF to image conversion failed: {str(e)}")
                 state["error"] = f"PDF to image conversion failed: {str(e)}"
                 return state
 
-            state["total_pages"] = len(pdf_images)
+            state["total_pages"] = page_count
             state["page_results"] = []
-            
-            logger.info(f"Processing document with {len(pdf_images)} pages in IMAGE_OCR mode")
-
-            # Process each page
-            for page_idx, image_base64 in enumerate(pdf_images):
-                state["current_page"] = page_idx + 1
-                
-                logger.info(f"Processing page {page_idx + 1}/{len(pdf_images)}")
-                
-                try:
-                    # TODO: Remove debug saving before commit - save base64 image info for debugging
-                    image_info = f"Base64 image data (length: {len(image_base64)} characters)"
-                    save_debug_text(image_info, page_idx + 1, "IMAGE_OCR")
-                    
-                    # Create message content with PNG image for this page
-                    page_prompt = f"{extraction_prompt}\n\nPage {page_idx + 1} of {len(pdf_images)}. Extract information from this specific page."
-                    message_content = [
-                        {"type": "text", "text": page_prompt}
-                    ]
-                    
-                    # Add current page as image
-                    message_content.append({
-                        "type": "image_url",
-                        "image_url": {
-                            "url": f"data:image/png;base64,{image_base64}"
-                        }
-                    })
 
-                    messages = [
-                        SystemMessage(content=system_prompt),
-                        HumanMessage(content=message_content)
-                    ]
+            logger.info(f"Processing document with {page_count} pages in IMAGE_OCR mode")
 
-                    response = llm.invoke(messages)
-                    page_result = parse_chatgpt_response(response.content)
-                    
-                    # Add page metadata
-                    page_result["page_number"] = page_idx + 1
-                    page_result["page_processing_status"] = "success"
-                    
-                    state["page_results"].append(page_result)
-                    logger.info(f"Page {page_idx + 1}: Successfully processed")
-                    
+            # Small documents fit in one batched multimodal request (unless
+            # blanks were found, which only the per-page path can skip)
+            if page_count <= settings.single_call_page_threshold and not blank_pages:
+                try:
+                    pdf_images = await asyncio.to_thread(
+                        pdf_to_images, state["file_content"], None, image_format)
+                    state["page_results"] = await _process_pages_single_call(
+                        batch_llm, system_prompt, pdf_images, image_mime
+                    )
                 except Exception as e:
-                    # Log page processing error but continue with other pages
-                    logger.error(f"Page {page_idx + 1}: Failed - {str(e)}")
-                    error_result = {
-                        "page_number": page_idx + 1,
-                        "page_processing_status": "failed",
-                        "error": str(e)
-                    }
-                    state["page_results"].append(error_result)
+                    logger.warning(f"Batched processing failed, falling back to per-page requests: {str(e)}")
+
+            if not state["page_results"]:
+                # Per-page path: overlap rasterization with the LLM calls
+                state["page_results"] = await _process_pages_overlapped(
+                    page_llm, system_prompt, state["file_content"],
+                    page_count, image_format, image_mime, blank_pages
+                )
+
+            state["current_page"] = page_count
 
             # Aggregate results from all pages
             successful_pages = len([p for p in state["page_results"] if p.get("page_processing_status") == "success"])
-            logger.info(f"Completed processing. Successful pages: {successful_pages}/{len(pdf_images)}")
-            
+            logger.info(f"Completed processing. Successful pages: {successful_pages}/{page_count}")
+
             if state["page_results"]:
                 state["processing_result"] = aggregate_page_results(state["page_results"])
                 state["processing_result"]["processing_mode"] = "IMAGE_OCR"
@@ -469,6 +971,19 @@ def process_with_chatgpt_node(state: DocumentState) -> DocumentState:
 
     return state
 
+# Compiled required-field validators, keyed by the field tuple per file type
+_VALIDATORS: Dict[tuple, Any] = {}
+
+
+def _get_required_fields_validator(required_fields: tuple):
+    """Return a compiled validator checking that the required fields exist"""
+    validator = _VALIDATORS.get(required_fields)
+    if validator is None:
+        validator = fastjsonschema.compile({"type": "object", "required": list(required_fields)})
+        _VALIDATORS[required_fields] = validator
+    return validator
+
+
 def validate_result_node(state: DocumentState) -> DocumentState:
     """Validate extraction results and optionally verify numbers/symbols"""
     if state["error"]:
@@ -478,13 +993,23 @@ def validate_result_node(state: DocumentState) -> DocumentState:
         state["error"] = "No processing result generated"
         return state
 
-    # Standard required field validation
+    # Standard required field validation; the compiled validator makes the
+    # common all-fields-present case a single call
     required_fields = state["file_type_prompts"].get("required_fields", [])
     validation_errors = []
 
-    for field in required_fields:
-        if field not in state["processing_result"]:
-            validation_errors.append(f"Missing required field: {field}")
+    if required_fields:
+        valid = False
+        if fastjsonschema is not None:
+            try:
+                _get_required_fields_validator(tuple(required_fields))(state["processing_result"])
+                valid = True
+            except fastjsonschema.JsonSchemaException:
+                pass
+
+        if not valid:
+            missing = set(required_fields) - state["processing_result"].keys()
+            validation_errors.extend(f"Missing required field: {field}" for field in missing)
 
     # Enhanced verification if enabled
     verification_enabled = state.get("verification_enabled", False)
@@ -537,15 +1062,13 @@ def perform_verification(result: Dict[str, Any]) -> List[str]:
 
 def _is_valid_number(value) -> bool:
     """Check if a value is a valid number"""
-    try:
-        if isinstance(value, (int, float)):
-            return not (isinstance(value, float) and (value != value))  # Check for NaN
-        if isinstance(value, str):
-            float(value.replace(",", "."))  # Handle Russian decimal separator
-            return True
-        return False
-    except (ValueError, TypeError):
-        return False
+    if isinstance(value, (int, float)):
+        return value == value  # NaN compares unequal to itself
+    if isinstance(value, str):
+        # Regex check instead of a float() attempt: messy OCR strings are
+        # the common case here and raising ValueError per field is costly
+        return bool(_NUM_RE.match(value.strip()))
+    return False
 
 # TODO: Remove debug function before commit - for debugging page-by-page processing
 def save_debug_text(page_text: str, page_number: int, processing_mode: str) -> None:
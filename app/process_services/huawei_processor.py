@@ -1,8 +1,28 @@
 from typing import Dict, Any, List, Optional
 from .base_processor import BaseProcessor
 import re
+import sys
 from decimal import Decimal, InvalidOperation
 
+# Compiled once at import; the extraction loops run these per act item.
+# Site and order references share one alternation so each description is
+# scanned once; the named groups tell the match kinds apart. Both branches
+# are zero-width lookaheads so a site capture does not consume the text an
+# order reference sits in (or vice versa) — matches may overlap, exactly
+# as the separate per-pattern scans reported them
+_SITE_ORDER_RE = re.compile(
+    r'(?=(?:объект|площадка|станция|узел)[:\s]+(?P<site>[^,\n]+))'
+    r'|(?=(?:заказ|order|№)[^\w]*(?P<order>\d+))',
+    re.IGNORECASE
+)
+# Trigger substrings for the fast reject; a description without any of
+# these cannot match _SITE_ORDER_RE, so the regex scan is skipped
+_KEYWORDS = ("объект", "площадка", "станция", "узел", "заказ", "order", "№")
+# First numeric token with either decimal separator (Russian comma)
+_NUM_TOKEN = re.compile(r'-?\d+(?:[.,]\d+)?')
+# Strips currency symbols and (non-breaking) spaces ahead of the token scan
+_CURRENCY_TBL = str.maketrans('', '', '₽$ \xa0')
+
 
 class HuaweiProcessor(BaseProcessor):
     """
@@ -12,6 +32,7 @@ class HuaweiProcessor(BaseProcessor):
 
     def __init__(self, file_type_prompts: Optional[Dict[str, Any]] = None):
         self.file_type_prompts = file_type_prompts
+        self._prompts_cache: Optional[Dict[str, Any]] = None
 
     def process_result(self, result: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -31,47 +52,57 @@ class HuaweiProcessor(BaseProcessor):
         """Process aggregated multi-page results"""
         processed = result.copy()
         aggregated_data = processed.get("aggregated_data", {})
-        
+
+        # Degenerate results (no act or no items) get minimal stats without
+        # paying for the processing and extraction passes
+        items = aggregated_data.get("act", {}).get("items") or []
+        if not items:
+            processed["processing_stats"] = {
+                "pages_processed": result.get("pages_processed", 0),
+                "total_act_items": 0,
+                "unique_sites": 0,
+                "unique_order_numbers": 0
+            }
+            return processed
+
         # Process aggregated act items
-        if "act" in aggregated_data and "items" in aggregated_data["act"]:
-            processed_items = []
-            total_quantity = 0
-            total_cost = 0
-            
-            for item in aggregated_data["act"]["items"]:
-                processed_item = self._process_act_item(item)
-                processed_items.append(processed_item)
-                
-                # Sum totals
-                if "quantity" in processed_item:
-                    try:
-                        total_quantity += float(processed_item["quantity"])
-                    except (ValueError, TypeError):
-                        pass
-                
-                if "total_cost" in processed_item:
-                    try:
-                        cost_value = self._extract_numeric_value(processed_item["total_cost"])
-                        total_cost += cost_value
-                    except (ValueError, TypeError):
-                        pass
-            
-            # Update aggregated totals
-            if "totals" not in aggregated_data["act"]:
-                aggregated_data["act"]["totals"] = {}
-            
-            aggregated_data["act"]["totals"]["total_quantity"] = total_quantity
-            aggregated_data["act"]["totals"]["total_cost"] = total_cost
-            aggregated_data["act"]["items"] = processed_items
-        
-        # Add processing statistics
+        processed_items = []
+        total_quantity = 0.0
+        total_cost = 0.0
+
+        for item in items:
+            # The items were deserialized for this call and have no
+            # other owner, so skip the per-item copy
+            processed_item = self._process_act_item(item, inplace=True)
+            processed_items.append(processed_item)
+
+            # Sum the numeric values _process_act_item just extracted
+            total_quantity += processed_item.get("quantity_numeric", 0.0)
+            total_cost += processed_item.get("total_cost_numeric", 0.0)
+
+        # Update aggregated totals
+        if "totals" not in aggregated_data["act"]:
+            aggregated_data["act"]["totals"] = {}
+
+        aggregated_data["act"]["totals"]["total_quantity"] = total_quantity
+        aggregated_data["act"]["totals"]["total_cost"] = total_cost
+        aggregated_data["act"]["items"] = processed_items
+
+        # Add processing statistics; descriptions are materialized once and
+        # shared instead of re-reading every item per extraction
+        descriptions = [
+            description for description in
+            (item.get("service_description") for item in processed_items)
+            if isinstance(description, str)
+        ]
+        unique_sites, unique_orders = self._count_sites_and_orders(descriptions)
         processed["processing_stats"] = {
             "pages_processed": result.get("pages_processed", 0),
-            "total_act_items": len(aggregated_data.get("act", {}).get("items", [])),
-            "unique_sites": len(self._extract_unique_sites(aggregated_data)),
-            "unique_order_numbers": len(self._extract_unique_order_numbers(aggregated_data))
+            "total_act_items": len(processed_items),
+            "unique_sites": unique_sites,
+            "unique_order_numbers": unique_orders
         }
-        
+
         return processed
 
     def _process_single_page_result(self, result: Dict[str, Any]) -> Dict[str, Any]:
@@ -93,9 +124,15 @@ class HuaweiProcessor(BaseProcessor):
         
         return processed
 
-    def _process_act_item(self, item: Dict[str, Any]) -> Dict[str, Any]:
-        """Process individual act item with numeric extraction"""
-        processed_item = item.copy()
+    def _process_act_item(self, item: Dict[str, Any], inplace: bool = False) -> Dict[str, Any]:
+        """
+        Process individual act item with numeric extraction.
+
+        With inplace=True the numeric fields are written onto the item
+        itself instead of a copy; callers use it when the item has no
+        other owner.
+        """
+        processed_item = item if inplace else item.copy()
         
         # Extract numeric values from cost fields
         if "unit_price" in processed_item:
@@ -121,71 +158,57 @@ class HuaweiProcessor(BaseProcessor):
         if not isinstance(value_str, str):
             return 0.0
         
-        # Remove common currency symbols and formatting
-        cleaned = str(value_str).replace("₽", "").replace("руб", "").replace("$", "")
-        cleaned = cleaned.replace(",", "").replace(" ", "").strip()
-        
-        # Handle Russian decimal separator
-        cleaned = cleaned.replace(",", ".")
-        
-        # Extract numeric part using regex
-        numeric_match = re.search(r'[\d.]+', cleaned)
+        # Strip currency markers and spacing, then take the first numeric
+        # token; the Russian decimal comma is converted on the token only
+        cleaned = value_str.replace("руб", "").translate(_CURRENCY_TBL)
+        numeric_match = _NUM_TOKEN.search(cleaned)
         if numeric_match:
-            try:
-                return float(numeric_match.group())
-            except ValueError:
-                pass
+            return float(numeric_match.group().replace(",", "."))
         
         return 0.0
 
-    def _extract_unique_sites(self, data: Dict[str, Any]) -> List[str]:
-        """Extract unique site/location names from act items"""
-        sites = set()
-        
-        if "act" in data and "items" in data["act"]:
-            for item in data["act"]["items"]:
-                description = item.get("service_description", "")
-                if isinstance(description, str):
-                    # Look for site patterns in Russian
-                    site_patterns = [
-                        r'объект[:\s]+([^,\n]+)',
-                        r'площадка[:\s]+([^,\n]+)',
-                        r'станция[:\s]+([^,\n]+)',
-                        r'узел[:\s]+([^,\n]+)'
-                    ]
-                    
-                    for pattern in site_patterns:
-                        matches = re.findall(pattern, description, re.IGNORECASE)
-                        sites.update(match.strip() for match in matches)
-        
-        return list(sites)
+    def _count_sites_and_orders(self, descriptions: List[str]) -> tuple:
+        """
+        Count unique site names and order numbers in item descriptions.
 
-    def _extract_unique_order_numbers(self, data: Dict[str, Any]) -> List[str]:
-        """Extract unique order numbers from act items"""
+        Only the counts leave this method; the sets stay internal so no
+        list of potentially hundreds of strings is materialized.
+        """
+        sites = set()
         orders = set()
         
-        if "act" in data and "items" in data["act"]:
-            for item in data["act"]["items"]:
-                description = item.get("service_description", "")
-                if isinstance(description, str):
-                    # Look for order number patterns
-                    order_patterns = [
-                        r'заказ[^\w]*(\d+)',
-                        r'order[^\w]*(\d+)',
-                        r'№[^\w]*(\d+)'
-                    ]
-                    
-                    for pattern in order_patterns:
-                        matches = re.findall(pattern, description, re.IGNORECASE)
-                        orders.update(matches)
-        
-        return list(orders)
+        for description in descriptions:
+            # Substring pre-check rejects the common no-reference case far
+            # cheaper than running the pattern over the whole description
+            lowered = description.lower()
+            if not any(keyword in lowered for keyword in _KEYWORDS):
+                continue
+
+            # One scan per description; the group that matched decides
+            # whether it is a site or an order reference
+            for match in _SITE_ORDER_RE.finditer(description):
+                site = match.group("site")
+                if site is not None:
+                    # Sites repeat heavily across items; interning makes the
+                    # set lookups identity-fast and dedups the heap copies
+                    sites.add(sys.intern(site.strip()))
+                else:
+                    orders.add(match.group("order"))
+        
+        return len(sites), len(orders)
 
     def get_prompts(self) -> Dict[str, Any]:
         """Return prompts for Huawei document processing"""
         if self.file_type_prompts:
             return self.file_type_prompts
         
+        # Built lazily on first use; the defaults never change per instance
+        if self._prompts_cache is None:
+            self._prompts_cache = self._default_prompts()
+        return self._prompts_cache
+
+    def _default_prompts(self) -> Dict[str, Any]:
+        """Build the default prompt dictionary"""
         return {
             "system_prompt": "You are a document processing assistant specializing in Russian work completion acts (АКТ ВЫПОЛНЕННЫХ РАБОТ) analysis. Extract key information from P-1 form telecommunications service documents and return it in structured JSON format. Pay attention to Cyrillic text, company names, addresses, contract numbers, and service details.",
             "extraction_prompt": "Extract the following information from this work completion act document: \n- document_type (form type, e.g., 'P-1') \n- document_number (if available) \n- date_of_issue (document creation/signing date) \n- customer details (name, full address, BIN/tax number) \n- contractor details (name, full address, BIN/tax number) \n- contract number and date \n- act items array containing: item number, service description (both Russian and English if available), completion date, unit of measurement, quantity, unit price, total cost \n- act totals (total quantity and total cost) \n- site/location names mentioned in service descriptions \n- order numbers referenced in descriptions. Return the data as valid JSON with proper Unicode encoding for Cyrillic characters.",
@@ -25,28 +25,28 @@ def setup_logging():
 def run_command(cmd: list, description: str) -> bool:
     """Run a shell command and log the result"""
     logger = logging.getLogger(__name__)
-    logger.info(f"Running: {description}")
-    logger.info(f"Command: {' '.join(cmd)}")
+    logger.info("Running: %s", description)
+    logger.info("Command: %s", " ".join(cmd))
     
     try:
         result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
         
         if result.returncode == 0:
-            logger.info(f"✅ {description} completed successfully")
+            logger.info("✅ %s completed successfully", description)
             if result.stdout:
-                logger.info(f"Output: {result.stdout}")
+                logger.info("Output: %s", result.stdout)
             return True
         else:
-            logger.error(f"❌ {description} failed with code {result.returncode}")
+            logger.error("❌ %s failed with code %s", description, result.returncode)
             if result.stderr:
-                logger.error(f"Error: {result.stderr}")
+                logger.error("Error: %s", result.stderr)
             return False
             
     except subprocess.TimeoutExpired:
-        logger.error(f"❌ {description} timed out after 5 minutes")
+        logger.error("❌ %s timed out after 5 minutes", description)
         return False
     except Exception as e:
-        logger.error(f"❌ {description} failed with exception: {str(e)}")
+        logger.error("❌ %s failed with exception: %s", description, str(e))
         return False
 
 
@@ -55,17 +55,23 @@ def check_database_connection() -> bool:
     logger = logging.getLogger(__name__)
     logger.info("🔍 Checking database connection...")
     
-    # Try to connect to database
-    cmd = [
-        'python', '-c',
-        'from app.core.database import SessionLocal; '
-        'db = SessionLocal(); '
-        'db.execute("SELECT 1"); '
-        'db.close(); '
-        'print("Database connection successful")'
-    ]
-    
-    return run_command(cmd, "Database connection check")
+    # Connect in-process; spawning an interpreter just for SELECT 1 pays
+    # a full app import on every run
+    try:
+        from sqlalchemy import text
+        from app.core.database import SessionLocal
+        
+        db = SessionLocal()
+        try:
+            db.execute(text("SELECT 1"))
+        finally:
+            db.close()
+        
+        logger.info("✅ Database connection check completed successfully")
+        return True
+    except Exception as e:
+        logger.error("❌ Database connection check failed: %s", str(e))
+        return False
 
 
 def get_current_migration_version() -> Optional[str]:
@@ -73,30 +79,18 @@ def get_current_migration_version() -> Optional[str]:
     logger = logging.getLogger(__name__)
     
     try:
-        cmd = [
-            'python', '-c',
-            'from alembic.config import Config; '
-            'from alembic import command; '
-            'from alembic.runtime.migration import MigrationContext; '
-            'from sqlalchemy import create_engine; '
-            'import os; '
-            'engine = create_engine(os.getenv("DATABASE_URL")); '
-            'with engine.connect() as connection: '
-            '    context = MigrationContext.configure(connection); '
-            '    print(context.get_current_revision() or "None")'
-        ]
+        from alembic.runtime.migration import MigrationContext
+        from app.core.database import engine
+        
+        with engine.connect() as connection:
+            context = MigrationContext.configure(connection)
+            version = context.get_current_revision()
+        
+        logger.info("📍 Current migration version: %s", version or "None")
+        return version
         
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
-        if result.returncode == 0:
-            version = result.stdout.strip()
-            logger.info(f"📍 Current migration version: {version}")
-            return version if version != "None" else None
-        else:
-            logger.warning("Could not determine current migration version")
-            return None
-            
     except Exception as e:
-        logger.warning(f"Could not determine current migration version: {str(e)}")
+        logger.warning("Could not determine current migration version: %s", str(e))
         return None
 
 
@@ -115,7 +109,7 @@ def run_migrations() -> bool:
     if success:
         new_version = get_current_migration_version()
         if new_version != current_version:
-            logger.info(f"📈 Migration completed: {current_version or 'None'} -> {new_version}")
+            logger.info("📈 Migration completed: %s -> %s", current_version or "None", new_version)
         else:
             logger.info("📋 Database already up to date")
     